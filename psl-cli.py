@@ -7,21 +7,33 @@ import sys
 from psl_class import ProSafeLinux
 import psl_typ
 
+# number of query_raw requests sent before waiting for the answers
+RAW_WINDOW = 32
+
+# output lines of query_raw
+RAW_FMT_NON = "NON:%04x:%-29s:%s\n"
+RAW_FMT_RES = "RES:%04x:%-29s:%s \n"
+RAW_FMT_ERR = "ERR:%04x:%s\n"
+RAW_FMT_DEBUG = "%x-%-29s%s\n"
+
 # pylint: disable=W0613
 
 
 def discover(args, switch):
     "Search for Switches"
     print("Searching for ProSafe Plus Switches ...\n")
+    found = False
     for data in switch.discover():
         found = True
-        for entry in data.keys():
-            print(entry.get_name() + ': ' + data[entry])
-        print("")
+        lines = []
+        for entry in data:
+            lines.append(entry.get_name() + ': ' + data[entry] + "\n")
+        lines.append("\n")
+        sys.stdout.write("".join(lines))
 
     if not found:
-        print("No result received...")
-        print("did you try to adjust your timeout?")
+        print("No result received...", file=sys.stderr)
+        print("did you try to adjust your timeout?", file=sys.stderr)
 
 # pylint: enable=W0613
 
@@ -32,113 +44,143 @@ def exploit(args, switch):
 def set_switch(args, switch):
     "Set values on switch"
     cmds = {ProSafeLinux.CMD_PASSWORD: args.passwd[0]}
+    opts = vars(args)
     for scmd in switch.get_setable_cmds():
-        if vars(args)[scmd.get_name()] is not None:
-            if isinstance(scmd, psl_typ.PslTypAction):
-                if vars(args)[scmd.get_name()]:
-                    cmds[scmd] = True
-            else:
-                if isinstance(scmd, psl_typ.PslTypBoolean):
-                    cmds[scmd] = (vars(args)[scmd.get_name()][0] == "on")
-                else:
-                    if len(vars(args)[scmd.get_name()])==1:
-                        cmds[scmd] = vars(args)[scmd.get_name()][0]
-                    else:
-                        cmds[scmd] = vars(args)[scmd.get_name()]
+        value = opts[scmd.get_name()]
+        # None: option not given, False: action not requested
+        if value is None or value is False:
+            continue
+        if isinstance(scmd, psl_typ.PslTypAction):
+            cmds[scmd] = True
+        elif isinstance(scmd, psl_typ.PslTypBoolean):
+            cmds[scmd] = (value[0] == "on")
+        elif len(value) == 1:
+            cmds[scmd] = value[0]
+        else:
+            cmds[scmd] = value
 
     valid, errors = switch.verify_data(cmds)
     if not valid:
         for error in errors:
-            print(error)
+            print(error, file=sys.stderr)
     else:
         print("Changing Values..\n")
         result = switch.transmit(cmds, args.mac[0])
         if 'error' in result:
-            print("FAILED: Error with " + str(result['error']))
+            print("FAILED: Error with " + str(result['error']),
+                  file=sys.stderr)
 
 
-def query(args, switch, querycommand = None):
-    "query values from the switch"
-    if not(args.passwd == None):
-        login = {switch.CMD_PASSWORD: args.passwd[0]}
-        switch.transmit(login, args.mac[0])
-    query_cmd = []
-    if querycommand != None:
-        query_cmd.append(querycommand)
-    else:
-        print("Query Values..\n")
-        for qarg in args.query:
-            if qarg == "all":
-                for k in switch.get_query_cmds():
-                    if ((k != ProSafeLinux.CMD_VLAN_ID) and
-                        (k != ProSafeLinux.CMD_VLAN802_ID)):
-                        #print("--------- " + k.get_name() + " ---------")
-                        query(args, switch, querycommand=k)
-                return
-            else:
-                query_cmd.append(switch.get_cmd_by_name(qarg))
-    switchdata = switch.query(query_cmd, args.mac[0])
+def print_query(args, query_cmd, switchdata):
+    "print the answer of the switch to a query"
     if switchdata != False:
         if switchdata == {}:
             print("%-29s empty data received" % (query_cmd[0].get_name()))
         else:
-            for key in list(switchdata.keys()):
+            for key in switchdata:
                 if isinstance(key, psl_typ.PslTyp):
                     key.print_result(switchdata[key])
                 else:
                     if args.debug:
                         print("-%-29s%s" % (key, switchdata[key]))
     else:
-        print("-- %s --" % (query_cmd[0].get_name()))
-        print("No result received...")
-        print("did you try to adjust your timeout?")
+        print("-- %s --" % (query_cmd[0].get_name()), file=sys.stderr)
+        print("No result received...", file=sys.stderr)
+        print("did you try to adjust your timeout?", file=sys.stderr)
     print("")
 
 
+def get_passwd(args):
+    "the password given on the command line or None"
+    if args.passwd == None:
+        return None
+    return args.passwd[0]
+
+
+def query(args, switch):
+    "query values from the switch"
+    passwd = get_passwd(args)
+    mac = args.mac[0]
+    get_cmd_by_name = switch.get_cmd_by_name
+    query_cmd = []
+    print("Query Values..\n")
+    for qarg in args.query:
+        if qarg == "all":
+            # send one query per command at once and print the answers
+            # in order, instead of waiting for each round-trip
+            all_cmds = [k for k in switch.get_query_cmds()
+                        if k not in (ProSafeLinux.CMD_VLAN_ID,
+                                     ProSafeLinux.CMD_VLAN802_ID)]
+            results = switch.query_many([[k] for k in all_cmds], mac, passwd)
+            for k, switchdata in zip(all_cmds, results):
+                print_query(args, [k], switchdata)
+            return
+        else:
+            query_cmd.append(get_cmd_by_name(qarg))
+    switchdata = switch.query(query_cmd, mac, passwd=passwd)
+    print_query(args, query_cmd, switchdata)
+
+
+def format_raw(args, i, switchdata, lines):
+    "append the output lines for the raw answer to command id i to lines"
+    if switchdata is False:
+        lines.append(RAW_FMT_ERR % (i, "no answer received"))
+        return
+    try:
+        found = None
+        for qcmd in switchdata:
+            if (isinstance(qcmd, psl_typ.PslTyp)):
+                if qcmd.get_id() == i:
+                    found = qcmd
+
+        if found is None:
+            lines.append(RAW_FMT_NON % (i, "", switchdata["raw"]))
+        else:
+            lines.append(RAW_FMT_RES % (i, switchdata[found],
+                                      switchdata["raw"]))
+        if args.debug:
+            for key in switchdata:
+                lines.append(RAW_FMT_DEBUG % (i, key, switchdata[key]))
+    except (KeyboardInterrupt, SystemExit):
+        raise
+    except:
+        lines.append(RAW_FMT_ERR % (i, sys.exc_info()[1]))
+
+
 def query_raw(args, switch):
     "get all values, even unknown"
     print("QUERY DEBUG RAW")
-    if not(args.passwd == None):
-        login = {switch.CMD_PASSWORD: args.passwd[0]}
-        switch.transmit(login, args.mac[0])
-    i = 0x0001
-    while (i < ProSafeLinux.CMD_END.get_id()):
-        query_cmd = []
-        query_cmd.append(psl_typ.PslTypHex(i, "Command %d" % i))
+    passwd = get_passwd(args)
+    mac = args.mac[0]
+    query_many = switch.query_many
+    # once for all windows, a failure here stops the command
+    ipadr = switch.ip_from_mac(mac)
+    if passwd is not None:
+        passwd = switch.encode_password(passwd, mac)
+    end_id = ProSafeLinux.CMD_END.get_id()
+    # keep up to RAW_WINDOW queries in flight, instead of waiting
+    # for each answer before asking for the next command id
+    for start in range(0x0001, end_id, RAW_WINDOW):
+        ids = range(start, min(start + RAW_WINDOW, end_id))
+        query_cmds = [[psl_typ.PslTypHex(i, "Command %d" % i)] for i in ids]
+        # one write per window instead of one print per line
+        lines = []
         try:
-            switchdata = switch.query(query_cmd, args.mac[0])
-            found = None
-            for qcmd in list(switchdata.keys()):
-                if (isinstance(qcmd, psl_typ.PslTyp)):
-                    if qcmd.get_id() == i:
-                        found = qcmd
-
-            if found is None:
-                print("NON:%04x:%-29s:%s" % (i, "", switchdata["raw"]))
-            else:
-                print("RES:%04x:%-29s:%s " % (i, switchdata[found],
-                    switchdata["raw"]))
-            if args.debug:
-                for key in list(switchdata.keys()):
-                    print("%x-%-29s%s" % (i, key, switchdata[key]))
+            results = query_many(query_cmds, mac, enc_passwd=passwd,
+                                 ipadr=ipadr)
         except (KeyboardInterrupt, SystemExit):
             raise
         except:
-            print("ERR:%04x:%s" % (i, sys.exc_info()[1]))
-        i = i + 1
-
+            for i in ids:
+                lines.append(RAW_FMT_ERR % (i, sys.exc_info()[1]))
+        else:
+            for i, switchdata in zip(ids, results):
+                format_raw(args, i, switchdata, lines)
+        sys.stdout.write("".join(lines))
 
-def main():
-    "main program"
-    cmd_funcs = {
-        "discover": discover,
-        "set": set_switch,
-        "query": query,
-        "query_raw": query_raw,
-        "exploit": exploit,
-    }
 
-    switch = ProSafeLinux()
+def build_parser(switch):
+    "the argument parser, the query and set options come from the switch"
     parser = argparse.ArgumentParser(
         description='Manage Netgear ProSafe Plus switches under Linux.')
     parser.add_argument("--interface", nargs=1, help="Interface",
@@ -162,13 +204,11 @@ def main():
     query_parser.add_argument("--mac", nargs=1,
         help="Hardware address of the switch", required=True)
     query_parser.add_argument("--passwd", nargs=1, help="password")
-    choices = []
-    for cmd in switch.get_query_cmds():
-        choices.append(cmd.get_name())
-    choices.append("all")
-    
+    valid_choices = {cmd.get_name() for cmd in switch.get_query_cmds()}
+    valid_choices.add("all")
+
     query_parser.add_argument("query", nargs="+", help="What to query for",
-        choices=choices)
+        choices=sorted(valid_choices))
 
     query_parser = subparsers.add_parser("query_raw",
         help="Query raw values from the switch")
@@ -195,13 +235,29 @@ def main():
                 metavar=cmd.get_metavar(),
                 choices=cmd.get_choices())
 
+    return parser
+
+
+def main():
+    "main program"
+    cmd_funcs = {
+        "discover": discover,
+        "set": set_switch,
+        "query": query,
+        "query_raw": query_raw,
+        "exploit": exploit,
+    }
+
+    switch = ProSafeLinux()
+    parser = build_parser(switch)
     args = parser.parse_args()
     interface = args.interface[0]
 
     switch.set_timeout(args.timeout)
 
     if not switch.bind(interface):
-        print("Interface has no addresses, cannot talk to switch")
+        print("Interface has no addresses, cannot talk to switch",
+              file=sys.stderr)
         return
 
     if (args.debug):
@@ -210,8 +266,9 @@ def main():
     if args.operation in cmd_funcs:
         cmd_funcs[args.operation](args, switch)
     else:
-        print("ERROR: operation not found!")
+        print("ERROR: operation not found!", file=sys.stderr)
 
-main()
+if __name__ == '__main__':
+    main()
 
 # vim:filetype=python:foldmethod=marker:autoindent:expandtab:tabstop=4
@@ -119,24 +119,34 @@ class ProSafeLinux:
         self.srcmac = None
         self.ssocket = None
         self.rsocket = None
+        self.interface = None
         self.timeout=0.1
 
         # i still see no win in randomizing the starting sequence...
         self.seq = random.randint(100, 2000)
         self.debug = False
         self.mac_cache = {}
+        self.firmware_cache = {}
         self.cmd_by_id = {}
         self.cmd_by_name = {}
         for key, value in  inspect.getmembers(ProSafeLinux):
             if key.startswith("CMD_"):
                 self.cmd_by_name[value.get_name()] = value
                 self.cmd_by_id[value.get_id()] = value
+        # the commands are fixed, so sort them out only once
+        self.query_cmds = tuple(cmd for cmd in self.cmd_by_name.values()
+                                if cmd.is_queryable())
+        self.setable_cmds = tuple(cmd for cmd in self.cmd_by_name.values()
+                                  if cmd.is_setable())
 
     def set_timeout(self, timeout):
         self.timeout=timeout
 
     def bind(self, interface):
         "bind to an interface"
+        if self.interface == interface:
+            # already bound, keep the sockets we have
+            return True
         self.myhost = get_ip_address(interface)
         if not self.myhost:
             return False
@@ -155,23 +165,16 @@ class ProSafeLinux:
         self.rsocket.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
         self.rsocket.bind(("255.255.255.255", self.RECPORT))
 
+        self.interface = interface
         return True
 
     def get_query_cmds(self):
         "return all commands which can be used in a query"
-        rtn = []
-        for cmd in list(self.cmd_by_name.values()):
-            if cmd.is_queryable():
-                rtn.append(cmd)
-        return rtn
+        return self.query_cmds
 
     def get_setable_cmds(self):
         "returns all commands which can be set"
-        rtn = []
-        for cmd in list(self.cmd_by_name.values()):
-            if cmd.is_setable():
-                rtn.append(cmd)
-        return rtn
+        return self.setable_cmds
 
     def get_cmd_by_name(self, name):
         "return a command by its name"
@@ -319,33 +322,107 @@ class ProSafeLinux:
         if message != None and message != False:
             if self.CMD_MAC in message:
                 if message[self.CMD_MAC].capitalize() == mac.capitalize():
+                    self.mac_cache[mac] = address[0]
                     return address[0]
         return "255.255.255.255"
 
-    def send_query(self, cmd_arr, mac, use_ip_func=True):
-        "request some values from a switch, without changing them"
-        if use_ip_func:
-            ipadr = self.ip_from_mac(mac)
-        else:
-            ipadr = "255.255.255.255"
+    def get_firmware_version(self, mac):
+        "query the firmware version of a switch as a number"
+        if mac in self.firmware_cache:
+            return self.firmware_cache[mac]
+        firmwarevers = self.query(self.get_cmd_by_name("firmwarever"), mac)
+        if not firmwarevers:
+            raise IOError("no answer to the firmware version query of %s, "
+                          "cannot encode the password" % mac)
+        firmwarevers = list(firmwarevers.values())[0].translate({ord("."):None})
+        # New firmwares put capital leter V in front ...
+        if "V" == firmwarevers[0]:
+            firmwarevers = firmwarevers[1:]
+        firmwarevers = int(firmwarevers)
+        if firmwarevers > 10004:
+            print("using password hack on firmware: %s" % (firmwarevers))
+        self.firmware_cache[mac] = firmwarevers
+        return firmwarevers
+
+    def encode_password(self, plainpass, mac):
+        "newer firmwares expect the password xor'ed with a fixed key"
+        if self.get_firmware_version(mac) > 10004:
+            _hashkey = "NtgrSmartSwitchRock"
+            _password = ""
+            for i in range(len(plainpass)):
+                _password += chr(ord(plainpass[i]) ^ ord(_hashkey[i]))
+            return _password
+        return plainpass
+
+    def send_query(self, cmd_arr, mac, use_ip_func=True, enc_passwd=None,
+                   ipadr=None):
+        """request some values from a switch, without changing them,
+        enc_passwd is a password already run through encode_password,
+        returns the sequence number of the request"""
+        if ipadr is None:
+            if use_ip_func:
+                ipadr = self.ip_from_mac(mac)
+            else:
+                ipadr = "255.255.255.255"
+        seq = self.seq
         data = self.baseudp(destmac=mac, ctype=self.CTYPE_QUERY_REQUEST)
+        if enc_passwd is not None:
+            data += self.addudp(self.CMD_PASSWORD, enc_passwd)
         for cmd in cmd_arr:
             data += self.addudp(cmd)
         data += self.addudp(self.CMD_END)
         self.send(ipadr, self.SENDPORT, data)
+        return seq
 
-    def query(self, cmd_arr, mac, with_address=False, use_ip_func=True):
+    def query(self, cmd_arr, mac, with_address=False, use_ip_func=True,
+              passwd=None):
         "get some values from the switch, but do not change them"
         # translate non-list to list
         if type(cmd_arr).__name__ != 'tupe' and type(cmd_arr).__name__ != 'list':
             cmd_arr = (cmd_arr, )
-        self.send_query(cmd_arr, mac, use_ip_func)
+        if passwd is not None:
+            # may ask the switch for its firmware, so before our own send
+            passwd = self.encode_password(passwd, mac)
+        self.send_query(cmd_arr, mac, use_ip_func, passwd)
         message, address = self.recv()
         if with_address:
             return (self.parse_data(message), address)
         else:
             return self.parse_data(message)
 
+    def query_many(self, cmd_arr_list, mac, passwd=None, enc_passwd=None,
+                   ipadr=None):
+        """send several queries without waiting for each answer, then collect
+        the answers (matched by sequence number) in the order of cmd_arr_list,
+        callers sending many batches can pass the password already encoded
+        (enc_passwd) and the address of the switch (ipadr)"""
+        # look up the address and the firmware (for the password) before
+        # sending, a lookup between the sends would receive (and lose) the
+        # answers to the queries already sent
+        if ipadr is None:
+            ipadr = self.ip_from_mac(mac)
+        if passwd is not None:
+            enc_passwd = self.encode_password(passwd, mac)
+        pending = {}
+        for idx, cmd_arr in enumerate(cmd_arr_list):
+            pending[self.send_query(cmd_arr, mac, enc_passwd=enc_passwd,
+                                    ipadr=ipadr)] = idx
+        results = [False] * len(cmd_arr_list)
+        switchmac = pack_mac(mac)
+        while pending:
+            message, address = self.recv()
+            if message is None:
+                break
+            # answers are broadcast, only take complete ones sent to us
+            # by this switch, other clients may use the same sequence
+            if (len(message) < 32 or message[8:14] != self.srcmac or
+                    message[14:20] != switchmac):
+                continue
+            seq = struct.unpack(">h", message[22:24])[0]
+            if seq in pending:
+                results[pending.pop(seq)] = self.parse_data(message)
+        return results
+
     def queryall(self, cmd_arr, mac, with_address=False, use_ip_func=True):
         "get some values from the switch, but do not change them"
         # translate non-list to list
@@ -362,25 +439,13 @@ class ProSafeLinux:
         "change something in the switch, like name, mac ..."
         transmit_counter = 0
         ipadr = self.ip_from_mac(mac)
+        _password = None
+        if type(cmddict).__name__ == 'dict' and self.CMD_PASSWORD in cmddict:
+            _password = self.encode_password(cmddict[self.CMD_PASSWORD], mac)
         data = self.baseudp(destmac=mac, ctype=self.CTYPE_TRANSMIT_REQUEST)
-        firmwarevers = self.query(self.get_cmd_by_name("firmwarever"), mac)
-        firmwarevers = list(firmwarevers.values())[0].translate({ord("."):None})
-        # New firmwares put capital leter V in front ...
-        if "V" == firmwarevers[0]:
-            firmwarevers = firmwarevers[1:]
 
         if type(cmddict).__name__ == 'dict':
-            if self.CMD_PASSWORD in cmddict:
-                if int(firmwarevers) > 10004:
-                    print("using password hack on firmware: %s" % 
-                            (firmwarevers))
-                    _hashkey = "NtgrSmartSwitchRock"
-                    _plainpass = cmddict[self.CMD_PASSWORD]
-                    _password = ""
-                    for i in range(len(_plainpass)):
-                        _password += chr(ord(_plainpass[i]) ^ ord(_hashkey[i]))
-                else:
-                    _password = cmddict[self.CMD_PASSWORD]
+            if _password is not None:
                 data += self.addudp(self.CMD_PASSWORD, _password)
             for cmd, pdata in list(cmddict.items()):
                 if cmd != self.CMD_PASSWORD: